@@ -3,13 +3,20 @@
 
 import argparse
 import asyncio
-import json
+import hashlib
 import os
+import shelve
 import sys
-from datetime import datetime
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, nullcontext, redirect_stdout
 from pathlib import Path
+from typing import Any, AsyncIterator
 
-from anthropic import Anthropic
+import httpx
+import msgspec
+import orjson
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+from anthropic.types import ToolUseBlock
 from dotenv import load_dotenv
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
@@ -18,26 +25,510 @@ from mcp.types import TextContent, Tool
 # Load environment variables from .env file
 load_dotenv()
 
-# Claude model to use for reasoning
-MODEL = "claude-sonnet-4-20250514"
+# Pretty-print tool inputs and results to the console (set AGENT_DEBUG=1)
+DEBUG = os.getenv("AGENT_DEBUG") == "1"
+
+# Claude model to use for reasoning and the final rationale
+MODEL = "claude-sonnet-4-5"
+
+# Faster model for the forced workflow-tool turns, which are pure routing
+ROUTING_MODEL = "claude-haiku-4-5"
+
+# Agent output: decisions are streamed as JSONL, then aggregated at shutdown
+DECISIONS_STREAM_FILE = Path(__file__).parent / "decisions.jsonl"
+DECISIONS_FILE = Path(__file__).parent / "decisions.json"
+
+# Orchestration instructions shared by every request
+SYSTEM_PROMPT = """You are a workflow orchestration agent. Process the request whose ID is given by the user by calling tools in this sequence:
+
+1. validate_preset(request_id=<request ID>)
+   - Check if the preset has all 4 texture channels (r, g, b, a) and naming configuration
+   - The tool automatically looks up the account from the request
+   - If validation FAILS: Stop here and return a customer-safe error message with a clarifying question
+
+2. If validation passes, continue with:
+   - plan_steps(request_id=<request ID>): Determine workflow steps based on rules
+   - assign_artist(request_id=<request ID>): Assign an artist based on skills and capacity
+     (these two are independent - call them together in a single parallel tool_use block)
+   - record_decision(request_id=<request ID>, decision_data={...}): Save the decision
+
+3. After completing all steps, provide a natural-language rationale explaining:
+   - What was validated
+   - Which workflow steps were planned and why
+   - Which artist was assigned and why (or why none could be assigned)
+   - Reference the specific tools you called
+
+Be thorough in your rationale - explain WHY each decision was made based on the tool results."""
+
+# Workflow state machine: the tools required at each step, in order. A
+# single-tool step forces that tool; independent tools share a step and are
+# called in parallel. Once all steps are done, the final rationale turn runs
+# with tool_choice "auto".
+WORKFLOW_STEPS = [
+    ("validate_preset",),
+    ("plan_steps", "assign_artist"),
+    ("record_decision",),
+]
+
+# Customer-safe messages returned when validate_preset reports errors, keyed
+# by the failure reason it returns (None for naming or channel errors in an
+# existing preset). They are formatted locally, so a failed validation costs
+# no further Claude turns.
+ERROR_TEMPLATES = {
+    None: (
+        "We couldn't start this request because its preset configuration has problems: "
+        "{errors}. Should we fill in the missing configuration with a default (for example, "
+        "emissive for a missing texture channel), or hold this batch until the preset is updated?"
+    ),
+    "request_not_found": (
+        "We couldn't start this request because we have no record of it: {errors}. "
+        "Could you confirm the request ID?"
+    ),
+    "no_account_in_request": (
+        "We couldn't start this request because it is not linked to an account: {errors}. "
+        "Which account should it be processed under?"
+    ),
+    "preset_not_found": (
+        "We couldn't start this request because its account has no preset configuration: "
+        "{errors}. Should we hold this request until a preset is set up for the account?"
+    ),
+}
+
+# User message for coalescing several requests into one conversation
+BATCH_PROMPT = """Process these requests in order: {request_ids}.
+
+For each one, call validate_preset -> plan_steps -> assign_artist -> record_decision. If validation fails for a request, skip its remaining tools and move on to the next request.
+
+When every request is done, reply with only a JSON object of the form:
+{{"decisions": [{{"request_id": "...", "rationale": "..."}}]}}
+with one entry per request, in order. Each rationale follows the same guidance as for a single request; for failed validations it is the customer-safe error message with a clarifying question."""
+
+# System prompt marked for Anthropic prompt caching, so iterations after the
+# first reuse the cached tools + system prefix
+SYSTEM_BLOCKS = [
+    {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+]
+
+# Seconds between status checks of a Message Batch in --async-batch mode
+BATCH_POLL_INTERVAL = 10
 
 # MCP server command
 SERVER_COMMAND = "python3"
 SERVER_ARGS = ["server.py"]
+SERVER_PARAMS = StdioServerParameters(command=SERVER_COMMAND, args=SERVER_ARGS, env=None)
+
+# Connection pool for the Anthropic client; keepalive sockets are reused
+# across requests instead of repeating TLS setup
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+_loads = orjson.loads
+
+
+def _encode_default(obj: Any) -> orjson.Fragment:
+    """Encode msgspec types (Structs, Raw) that orjson cannot handle natively."""
+    return orjson.Fragment(msgspec.json.encode(obj))
+
+
+def _dumps(obj: Any, pretty: bool = False) -> str:
+    """Serialize obj to a JSON string, indented only when pretty is set."""
+    return orjson.dumps(
+        obj,
+        default=_encode_default,
+        option=orjson.OPT_INDENT_2 if pretty else 0
+    ).decode()
+
+
+def _utc_timestamp() -> str:
+    """Return the current UTC time in ISO 8601 without building a datetime."""
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{nanos // 1000:06d}+00:00"
+
+
+class TraceEntry(msgspec.Struct):
+    """One tool call in a request's audit trail."""
+
+    tool: str
+    input: msgspec.Raw  # canonical JSON bytes, embedded as-is when encoded
+    timestamp: str
+    output: dict | None = None
+
+
+def _new_anthropic() -> AsyncAnthropic:
+    """
+    Create an Anthropic client with a pooled HTTP/2 connection.
+
+    The connection pool is bound to the event loop that first uses it, so a
+    client is created per run_agent() call and reused for all of its requests.
+    """
+    return AsyncAnthropic(
+        api_key=os.environ["ANTHROPIC_API_KEY"],
+        http_client=DefaultAsyncHttpxClient(limits=HTTP_LIMITS, http2=True)
+    )
+
+
+# Sink for --output-format stream-json events (None when disabled)
+_event_stream = None
+
+
+def emit_event(event_type: str, **fields) -> None:
+    """Write one JSON event line to the stream-json sink, if enabled."""
+    if _event_stream is None:
+        return
+    _event_stream.write(_dumps({"type": event_type, **fields}) + "\n")
+    _event_stream.flush()
+
+
+# Anthropic-format tool definitions per MCP session, keyed by id(session)
+_TOOL_CACHE: dict[int, list[dict]] = {}
+
+# Read-only tools whose results are safe to reuse across calls
+CACHEABLE_TOOLS = {"validate_preset", "plan_steps"}
+
+# Default lifetime of cached tool results, in seconds
+DEFAULT_CACHE_TTL = 300
+
+
+class ToolCache:
+    """Exact-match cache of tool outputs keyed by tool name and canonical input.
+
+    Entries are held in memory and, when a path is given, mirrored to a
+    shelve file so results can be reused across runs.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_CACHE_TTL, path: Path | None = None):
+        self.ttl = ttl
+        self._entries: dict[str, tuple[float, str]] = {}
+        self._shelf = shelve.open(str(path)) if path else None
+
+    @staticmethod
+    def make_key(tool_name: str, canonical_input: bytes) -> str:
+        """Hash the tool name and its canonical (sorted, compact) JSON input."""
+        return hashlib.blake2b(tool_name.encode() + b"|" + canonical_input).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Return the cached output for key, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None and self._shelf is not None:
+            entry = self._shelf.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.time():
+            self._entries.pop(key, None)
+            return None
+
+        self._entries[key] = entry
+        return value
+
+    def set(self, key: str, value: str, ttl: float | None = None) -> None:
+        """Store value under key for ttl seconds (defaults to the cache TTL)."""
+        entry = (time.time() + (self.ttl if ttl is None else ttl), value)
+        self._entries[key] = entry
+        if self._shelf is not None:
+            self._shelf[key] = entry
+
+    def close(self) -> None:
+        """Flush and close the on-disk store, if any."""
+        if self._shelf is not None:
+            self._shelf.close()
+            self._shelf = None
+
+
+class MCPSessionPool:
+    """Pool of MCP client sessions, each backed by its own server subprocess.
+
+    A single stdio pipe serializes every tool call; pooling K sessions lets
+    concurrent requests dispatch tool calls in parallel.
+    """
+
+    def __init__(self, server_params: StdioServerParameters, size: int):
+        self.server_params = server_params
+        self.size = size
+        self._sessions: asyncio.Queue[ClientSession] = asyncio.Queue()
+
+    async def start(self, stack: AsyncExitStack) -> None:
+        """Spawn and initialize all pooled sessions, closed when the stack exits."""
+        for _ in range(self.size):
+            read, write = await stack.enter_async_context(stdio_client(self.server_params))
+            session = await stack.enter_async_context(ClientSession(read, write))
+            await session.initialize()
+            self._sessions.put_nowait(session)
+
+    def release(self, session: ClientSession) -> None:
+        """Return a session to the pool."""
+        self._sessions.put_nowait(session)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[ClientSession]:
+        """Borrow a session for the duration of the block."""
+        session = await self._sessions.get()
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+
+async def get_anthropic_tools(session: ClientSession) -> list[dict]:
+    """
+    List the session's tools once and convert them to Anthropic tool format.
+
+    The tool catalog is static for the lifetime of a session, so the result
+    is memoized in _TOOL_CACHE. The last tool carries a cache_control marker
+    so the tool schema is served from Anthropic's prompt cache.
+    """
+    key = id(session)
+    if key not in _TOOL_CACHE:
+        tools_response = await session.list_tools()
+        _TOOL_CACHE[key] = [
+            {
+                "name": tool.name,
+                "description": tool.description or "",
+                "input_schema": tool.inputSchema
+            }
+            for tool in tools_response.tools
+        ]
+        if _TOOL_CACHE[key]:
+            _TOOL_CACHE[key][-1]["cache_control"] = {"type": "ephemeral"}
+    return _TOOL_CACHE[key]
+
+
+async def call_tool_cached(
+    pool: MCPSessionPool,
+    tool_cache: ToolCache,
+    tool_name: str,
+    tool_input: dict,
+    canonical_input: bytes
+) -> str | None:
+    """
+    Call an MCP tool, serving read-only tools from the cache when possible.
+
+    canonical_input is tool_input already serialized with sorted keys and
+    is used as the cache key material.
+
+    Returns:
+        Concatenated text content of the result, or None if the tool
+        returned no content
+    """
+    cache_key = None
+    if tool_name in CACHEABLE_TOOLS:
+        cache_key = ToolCache.make_key(tool_name, canonical_input)
+        cached = tool_cache.get(cache_key)
+        if cached is not None:
+            print(f"Cache hit: {tool_name}")
+            return cached
+
+    async with pool.acquire() as session:
+        result = await session.call_tool(tool_name, arguments=tool_input)
+
+    if not result.content:
+        return None
+
+    tool_output = ""
+    for content_item in result.content:
+        if isinstance(content_item, TextContent):
+            tool_output += content_item.text
+
+    if cache_key is not None and not result.isError:
+        tool_cache.set(cache_key, tool_output)
+
+    return tool_output
+
+
+async def execute_tool_call(
+    tool_use,
+    pool: MCPSessionPool,
+    tool_cache: ToolCache,
+    tool_trace: list[TraceEntry]
+) -> tuple[dict, dict | None]:
+    """
+    Execute one tool_use block via MCP and record it in the trace.
+
+    Args:
+        tool_use: tool_use content block from Claude's response
+        pool: Pool of active MCP client sessions
+        tool_cache: Cache of read-only tool results
+        tool_trace: Audit trail the call is appended to
+
+    Returns:
+        The tool_result block for the next message, and the parsed tool
+        output (None if the call failed or returned nothing)
+    """
+    tool_name = tool_use.name
+    tool_input = tool_use.input
+    # Serialize once; the bytes serve the debug log, cache key and trace
+    canonical_input = orjson.dumps(tool_input, option=orjson.OPT_SORT_KEYS)
+
+    print(f"Calling tool: {tool_name}")
+    if DEBUG:
+        print(f"Input: {canonical_input.decode()}")
+
+    # Record tool call in trace
+    trace_entry = TraceEntry(
+        tool=tool_name,
+        input=msgspec.Raw(canonical_input),
+        timestamp=_utc_timestamp()
+    )
+    tool_trace.append(trace_entry)
+
+    # Execute the tool via MCP
+    try:
+        tool_output = await call_tool_cached(
+            pool, tool_cache, tool_name, tool_input, canonical_input
+        )
+
+        if tool_output is None:
+            # No content returned
+            return {
+                "type": "tool_result",
+                "tool_use_id": tool_use.id,
+                "content": _dumps({"error": "No result returned"})
+            }, None
+
+        # Parse the JSON result
+        tool_result_data = _loads(tool_output)
+
+        print(f"Result: {_dumps(tool_result_data, pretty=DEBUG)}")
+
+        # Add to trace
+        trace_entry.output = tool_result_data
+
+        return {
+            "type": "tool_result",
+            "tool_use_id": tool_use.id,
+            "content": tool_output
+        }, tool_result_data
+
+    except Exception as e:
+        print(f"Error calling tool: {e}")
+        return {
+            "type": "tool_result",
+            "tool_use_id": tool_use.id,
+            "content": _dumps({"error": str(e)}),
+            "is_error": True
+        }, None
+
+
+async def reject_tool_call(tool_use, allowed_tools: set[str]) -> tuple[dict, None]:
+    """Answer a tool call outside the current workflow step without running it."""
+    print(f"Rejecting out-of-step tool: {tool_use.name}")
+    return {
+        "type": "tool_result",
+        "tool_use_id": tool_use.id,
+        "content": _dumps({
+            "error": f"{tool_use.name} is not allowed at this step; call {', '.join(sorted(allowed_tools))}"
+        }),
+        "is_error": True
+    }, None
+
+
+async def stream_turn(
+    anthropic_client: AsyncAnthropic,
+    pool: MCPSessionPool,
+    tool_cache: ToolCache,
+    tool_trace: list[TraceEntry],
+    allowed_tools: set[str] | None = None,
+    **request
+) -> tuple[Any, str, list[tuple[Any, tuple[dict, dict | None]]]]:
+    """
+    Stream one Claude turn, dispatching each tool call as soon as its
+    tool_use block is complete rather than after the whole response.
+
+    Args:
+        anthropic_client: Anthropic API client
+        pool: Pool of active MCP client sessions
+        tool_cache: Cache of read-only tool results
+        tool_trace: Audit trail tool calls are appended to
+        allowed_tools: If set, tools outside it get an is_error tool_result
+            instead of running
+        **request: Parameters for messages.stream
+
+    Returns:
+        The final message, its concatenated text, and each tool_use block
+        paired with its execute_tool_call result, in block order
+    """
+    # Text and tool_use blocks are both collected in this single pass
+    text_parts = []
+    tool_tasks = []
+    try:
+        async with anthropic_client.messages.stream(**request) as stream:
+            async for event in stream:
+                if event.type != "content_block_stop":
+                    continue
+                content_block = event.content_block
+                if content_block.type == "tool_use":
+                    if allowed_tools is None or content_block.name in allowed_tools:
+                        call = execute_tool_call(content_block, pool, tool_cache, tool_trace)
+                    else:
+                        call = reject_tool_call(content_block, allowed_tools)
+                    tool_tasks.append((content_block, asyncio.create_task(call)))
+                elif content_block.type == "text":
+                    text_parts.append(content_block.text)
+            response = await stream.get_final_message()
+    except BaseException:
+        for _, task in tool_tasks:
+            task.cancel()
+        raise
+
+    outcomes = await asyncio.gather(*(task for _, task in tool_tasks))
+    tool_calls = [(tool_use, outcome) for (tool_use, _), outcome in zip(tool_tasks, outcomes)]
+    return response, "".join(text_parts), tool_calls
+
+
+def validation_failure_decision(
+    request_id: str,
+    tool_trace: list[TraceEntry],
+    validation: dict
+) -> dict:
+    """
+    Build the decision for a request whose preset failed validation.
+
+    Args:
+        request_id: The request ID that failed validation
+        tool_trace: Audit trail so far, which gets a stopped_early entry
+        validation: The failed validate_preset output
+
+    Returns:
+        Decision dictionary with the customer error message for the
+        failure's reason
+    """
+    errors = validation.get("errors", [])
+    template = ERROR_TEMPLATES.get(validation.get("reason"), ERROR_TEMPLATES[None])
+
+    print("\n⚠️  Validation failed - stopping early with templated error message")
+
+    tool_trace.append(TraceEntry(
+        tool="stopped_early",
+        input=msgspec.Raw(b'{"reason":"validation_failed"}'),
+        timestamp=_utc_timestamp(),
+        output={"errors": errors}
+    ))
+
+    return {
+        "request_id": request_id,
+        "validation_passed": False,
+        "rationale": template.format(errors=", ".join(errors)),
+        "trace": tool_trace,
+        "completed_at": _utc_timestamp()
+    }
 
 
 async def process_request(
     request_id: str,
-    session: ClientSession,
-    anthropic_client: Anthropic
+    pool: MCPSessionPool,
+    anthropic_client: AsyncAnthropic,
+    anthropic_tools: list[dict],
+    tool_cache: ToolCache
 ) -> dict:
     """
     Process a single request through the workflow.
 
     Args:
         request_id: The request ID to process
-        session: Active MCP client session
+        pool: Pool of active MCP client sessions
         anthropic_client: Anthropic API client
+        anthropic_tools: MCP tools converted to Anthropic tool format
+        tool_cache: Cache of read-only tool results
 
     Returns:
         Dictionary containing decision, rationale, and trace
@@ -49,62 +540,64 @@ async def process_request(
     # Track all tool calls for audit trail
     tool_trace = []
 
-    # Get available tools from MCP server
-    tools_response = await session.list_tools()
-    available_tools = tools_response.tools
-
-    # Convert MCP tools to Anthropic tool format
-    anthropic_tools = [
-        {
-            "name": tool.name,
-            "description": tool.description or "",
-            "input_schema": tool.inputSchema
-        }
-        for tool in available_tools
-    ]
-
-    # Initial prompt for the agent
-    initial_prompt = f"""You are a workflow orchestration agent. Process request "{request_id}" by calling tools in this sequence:
-
-1. validate_preset(request_id="{request_id}")
-   - Check if the preset has all 4 texture channels (r, g, b, a) and naming configuration
-   - The tool automatically looks up the account from the request
-   - If validation FAILS: Stop here and return a customer-safe error message with a clarifying question
-
-2. If validation passes, continue with:
-   - plan_steps(request_id="{request_id}"): Determine workflow steps based on rules
-   - assign_artist(request_id="{request_id}"): Assign an artist based on skills and capacity
-   - record_decision(request_id="{request_id}", decision_data={{...}}): Save the decision
-
-3. After completing all steps, provide a natural-language rationale explaining:
-   - What was validated
-   - Which workflow steps were planned and why
-   - Which artist was assigned and why (or why none could be assigned)
-   - Reference the specific tools you called
-
-Be thorough in your rationale - explain WHY each decision was made based on the tool results."""
-
-    messages = [{"role": "user", "content": initial_prompt}]
+    # Only the request ID varies per request, so it lives in a short user
+    # message that does not invalidate the cached system prompt
+    messages = [{"role": "user", "content": f'Process request "{request_id}".'}]
 
     iteration = 0
     max_iterations = 20  # Safety limit to prevent infinite loops
 
-    validation_failed = False
-    validation_errors = []
+    # Index into WORKFLOW_STEPS, and the step's tools not yet called
+    step = 0
+    pending_tools = set(WORKFLOW_STEPS[step])
 
     while iteration < max_iterations:
         iteration += 1
         print(f"\n--- Iteration {iteration} ---")
 
-        # Call Claude with available tools
-        response = anthropic_client.messages.create(
-            model=MODEL,
+        # Force the next workflow tool(s) so Claude skips reasoning-only turns.
+        # tool_choice "any" cannot name tools, so calls outside the step are
+        # also rejected before they run; once the workflow is done, the
+        # rationale turn may only re-read, not record another decision.
+        if step < len(WORKFLOW_STEPS):
+            allowed_tools = set(pending_tools)
+            if len(pending_tools) == 1:
+                tool_choice = {
+                    "type": "tool",
+                    "name": next(iter(pending_tools)),
+                    "disable_parallel_tool_use": True
+                }
+            else:
+                tool_choice = {"type": "any"}
+        else:
+            allowed_tools = set().union(*WORKFLOW_STEPS[:-1])
+            tool_choice = {"type": "auto", "disable_parallel_tool_use": True}
+
+        # Only the free-form rationale turn needs the stronger model
+        model = MODEL if tool_choice["type"] == "auto" else ROUTING_MODEL
+
+        # Call Claude with available tools; tool calls start while it streams
+        response, final_text, tool_calls = await stream_turn(
+            anthropic_client,
+            pool,
+            tool_cache,
+            tool_trace,
+            allowed_tools=allowed_tools,
+            model=model,
             max_tokens=4096,
+            system=SYSTEM_BLOCKS,
             tools=anthropic_tools,
+            tool_choice=tool_choice,
             messages=messages
         )
 
         print(f"Stop reason: {response.stop_reason}")
+        emit_event(
+            "iteration",
+            request_id=request_id,
+            iteration=iteration,
+            stop_reason=response.stop_reason
+        )
 
         # Check if Claude wants to use tools
         if response.stop_reason == "tool_use":
@@ -113,95 +606,38 @@ Be thorough in your rationale - explain WHY each decision was made based on the
             # Process each tool call
             tool_results = []
 
-            for content_block in response.content:
-                if content_block.type == "tool_use":
-                    tool_name = content_block.name
-                    tool_input = content_block.input
-                    tool_use_id = content_block.id
-
-                    print(f"Calling tool: {tool_name}")
-                    print(f"Input: {json.dumps(tool_input, indent=2)}")
+            for content_block, (tool_result, tool_result_data) in tool_calls:
+                tool_results.append(tool_result)
 
-                    # Record tool call in trace
-                    tool_trace.append({
-                        "tool": tool_name,
-                        "input": tool_input,
-                        "timestamp": datetime.now().isoformat()
-                    })
+                # Advance the state machine once every tool in the step has run
+                pending_tools.discard(content_block.name)
+                if not pending_tools and step < len(WORKFLOW_STEPS):
+                    step += 1
+                    if step < len(WORKFLOW_STEPS):
+                        pending_tools = set(WORKFLOW_STEPS[step])
 
-                    # Execute the tool via MCP
-                    try:
-                        result = await session.call_tool(tool_name, arguments=tool_input)
-
-                        # Extract text content from result
-                        if result.content:
-                            tool_output = ""
-                            for content_item in result.content:
-                                if isinstance(content_item, TextContent):
-                                    tool_output += content_item.text
-
-                            # Parse the JSON result
-                            tool_result_data = json.loads(tool_output)
-
-                            print(f"Result: {json.dumps(tool_result_data, indent=2)}")
-
-                            # Add to trace
-                            tool_trace[-1]["output"] = tool_result_data
-
-                            # Check for validation failure
-                            if tool_name == "validate_preset" and not tool_result_data.get("ok"):
-                                validation_failed = True
-                                validation_errors = tool_result_data.get("errors", [])
-
-                            # Add tool result to messages
-                            tool_results.append({
-                                "type": "tool_result",
-                                "tool_use_id": tool_use_id,
-                                "content": tool_output
-                            })
-                        else:
-                            # No content returned
-                            tool_results.append({
-                                "type": "tool_result",
-                                "tool_use_id": tool_use_id,
-                                "content": json.dumps({"error": "No result returned"})
-                            })
-
-                    except Exception as e:
-                        print(f"Error calling tool: {e}")
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": tool_use_id,
-                            "content": json.dumps({"error": str(e)}),
-                            "is_error": True
-                        })
+                # Stop without another Claude turn if validation failed
+                if (
+                    content_block.name == "validate_preset"
+                    and tool_result_data is not None
+                    and not tool_result_data.get("ok")
+                ):
+                    return validation_failure_decision(request_id, tool_trace, tool_result_data)
 
             # Add all tool results to message history
             messages.append({"role": "user", "content": tool_results})
 
-            if validation_failed:
-                print("\n⚠️  Validation failed - asking agent to generate customer error message")
-                messages.append({
-                    "role": "user",
-                    "content": f"Validation failed with errors: {validation_errors}. Stop the workflow here and generate a customer-safe error message explaining what's wrong, AND include a clarifying question to help resolve the issue (e.g., 'Should we default to emissive for the missing channel or block this batch?'). Do not proceed with plan_steps, assign_artist, or record_decision."
-                })
-
         elif response.stop_reason == "end_turn":
             print("\n✅ Agent completed processing")
 
-            final_text = ""
-            for content_block in response.content:
-                if hasattr(content_block, "text"):
-                    final_text += content_block.text
-
             print(f"\nFinal response:\n{final_text}")
 
             return {
                 "request_id": request_id,
-                "validation_passed": not validation_failed,
+                "validation_passed": True,
                 "rationale": final_text,
                 "trace": tool_trace,
-                "completed_at": datetime.now().isoformat()
+                "completed_at": _utc_timestamp()
             }
 
         else:
@@ -214,79 +650,480 @@ Be thorough in your rationale - explain WHY each decision was made based on the
         "validation_passed": False,
         "rationale": "Agent exceeded maximum iteration limit",
         "trace": tool_trace,
-        "completed_at": datetime.now().isoformat(),
+        "completed_at": _utc_timestamp(),
         "error": "max_iterations_exceeded"
     }
 
 
-async def run_agent(request_ids: list[str]):
+def batch_decision(
+    request_id: str,
+    tool_trace: list[TraceEntry],
+    rationale: str,
+    completed_at: str
+) -> dict:
+    """Build one request's decision from the tool calls it made in a batch."""
+    trace = [
+        entry for entry in tool_trace
+        if _loads(memoryview(entry.input)).get("request_id") == request_id
+    ]
+    # Derive the verdict from the tool output rather than the reply
+    validation_passed = any(
+        entry.tool == "validate_preset" and (entry.output or {}).get("ok")
+        for entry in trace
+    )
+    return {
+        "request_id": request_id,
+        "validation_passed": validation_passed,
+        "rationale": rationale,
+        "trace": trace,
+        "completed_at": completed_at
+    }
+
+
+def recorded_batch_decisions(
+    request_ids: list[str],
+    tool_trace: list[TraceEntry],
+    error: Exception
+) -> dict[str, dict]:
+    """
+    Salvage the requests a failed batch had already recorded a decision for.
+
+    Those requests keep their batch trace instead of being re-run, so
+    record_decision is not called twice for them.
+
+    Returns:
+        Decisions keyed by request ID, only for requests with a
+        record_decision call in the trace
+    """
+    completed_at = _utc_timestamp()
+    decisions = {}
+    for request_id in request_ids:
+        decision = batch_decision(request_id, tool_trace, "", completed_at)
+        if any(entry.tool == "record_decision" for entry in decision["trace"]):
+            decision["error"] = f"Batch failed after the decision was recorded: {error}"
+            decisions[request_id] = decision
+    return decisions
+
+
+async def process_batch(
+    request_ids: list[str],
+    pool: MCPSessionPool,
+    anthropic_client: AsyncAnthropic,
+    anthropic_tools: list[dict],
+    tool_cache: ToolCache,
+    tool_trace: list[TraceEntry]
+) -> list[dict]:
+    """
+    Process several requests in a single Claude conversation.
+
+    Sharing one conversation sends the orchestration prompt once for the
+    whole batch instead of once per request.
+
+    Args:
+        request_ids: The request IDs to process together
+        pool: Pool of active MCP client sessions
+        anthropic_client: Anthropic API client
+        anthropic_tools: MCP tools converted to Anthropic tool format
+        tool_cache: Cache of read-only tool results
+        tool_trace: Audit trail the batch's tool calls are appended to; owned
+            by the caller so it can see which decisions were already recorded
+            if the batch fails
+
+    Returns:
+        One decision per request ID, in the given order
+
+    Raises:
+        RuntimeError: If the conversation does not finish normally
+        ValueError: If Claude's final reply does not cover every request
+    """
+    print(f"\n{'='*60}")
+    print(f"Processing batch: {', '.join(request_ids)}")
+    print(f"{'='*60}")
+
+    prompt = BATCH_PROMPT.format(request_ids=", ".join(f'"{rid}"' for rid in request_ids))
+    messages = [{"role": "user", "content": prompt}]
+
+    iteration = 0
+    max_iterations = 20 * len(request_ids)  # Safety limit to prevent infinite loops
+
+    while iteration < max_iterations:
+        iteration += 1
+        print(f"\n--- Batch iteration {iteration} ---")
+
+        response, final_text, tool_calls = await stream_turn(
+            anthropic_client,
+            pool,
+            tool_cache,
+            tool_trace,
+            model=MODEL,
+            max_tokens=4096,
+            system=SYSTEM_BLOCKS,
+            tools=anthropic_tools,
+            messages=messages
+        )
+
+        print(f"Stop reason: {response.stop_reason}")
+        emit_event(
+            "iteration",
+            request_ids=request_ids,
+            iteration=iteration,
+            stop_reason=response.stop_reason
+        )
+
+        if response.stop_reason == "tool_use":
+            messages.append({"role": "assistant", "content": response.content})
+
+            tool_results = [tool_result for _, (tool_result, _) in tool_calls]
+
+            messages.append({"role": "user", "content": tool_results})
+
+        elif response.stop_reason == "end_turn":
+            print(f"\nFinal response:\n{final_text}")
+
+            # The reply should be a JSON object; tolerate surrounding prose
+            start, end = final_text.find("{"), final_text.rfind("}")
+            if start == -1 or end < start:
+                raise ValueError("Batch reply contained no JSON object")
+            rationales = {
+                entry["request_id"]: entry.get("rationale", "")
+                for entry in _loads(final_text[start:end + 1]).get("decisions", [])
+            }
+
+            missing = [rid for rid in request_ids if rid not in rationales]
+            if missing:
+                raise ValueError(f"Batch reply has no decision for: {missing}")
+
+            completed_at = _utc_timestamp()
+            return [
+                batch_decision(request_id, tool_trace, rationales[request_id], completed_at)
+                for request_id in request_ids
+            ]
+
+        else:
+            raise RuntimeError(f"Unexpected stop reason: {response.stop_reason}")
+
+    raise RuntimeError(f"Batch exceeded maximum iterations ({max_iterations})")
+
+
+async def prerun_workflow(
+    request_id: str,
+    pool: MCPSessionPool,
+    tool_cache: ToolCache
+) -> tuple[list[dict], list[TraceEntry], dict | None]:
+    """
+    Run the tool sequence locally and replay it as a synthetic conversation.
+
+    Used by --async-batch mode, where only the final rationale turn is sent
+    to Claude, so the tool calls must already be in the message history.
+
+    Args:
+        request_id: The request ID to process
+        pool: Pool of active MCP client sessions
+        tool_cache: Cache of read-only tool results
+
+    Returns:
+        Messages ending with the last tool_result, the tool trace, and the
+        failed validate_preset output (None if validation passed)
+
+    Raises:
+        RuntimeError: If validate_preset returns no result, so there is no
+            verdict to act on
+    """
+    tool_trace = []
+    messages = [{"role": "user", "content": f'Process request "{request_id}".'}]
+
+    async def run_step(tool_name: str, tool_input: dict) -> dict | None:
+        tool_use = ToolUseBlock(
+            id=f"toolu_{len(tool_trace) + 1:02d}",
+            name=tool_name,
+            input=tool_input,
+            type="tool_use"
+        )
+        tool_result, tool_result_data = await execute_tool_call(
+            tool_use, pool, tool_cache, tool_trace
+        )
+        messages.append({"role": "assistant", "content": [tool_use.to_dict()]})
+        messages.append({"role": "user", "content": [tool_result]})
+        return tool_result_data
+
+    validation = await run_step("validate_preset", {"request_id": request_id})
+    if validation is None:
+        raise RuntimeError("validate_preset returned no result")
+    if not validation.get("ok"):
+        return messages, tool_trace, validation
+
+    plan = await run_step("plan_steps", {"request_id": request_id}) or {}
+    assignment = await run_step("assign_artist", {"request_id": request_id}) or {}
+    await run_step("record_decision", {
+        "request_id": request_id,
+        "decision_data": {
+            "steps": plan.get("steps", []),
+            "artist_id": assignment.get("artist_id"),
+            "validation_passed": True
+        }
+    })
+    return messages, tool_trace, None
+
+
+async def run_agent_batch(
+    request_ids: list[str],
+    pool: MCPSessionPool,
+    anthropic_client: AsyncAnthropic,
+    anthropic_tools: list[dict],
+    tool_cache: ToolCache,
+    max_concurrency: int
+) -> list[dict]:
+    """
+    Process requests offline through the Anthropic Message Batches API.
+
+    Tool calls run locally first; the rationale turns for all requests are
+    then submitted as one Message Batch, which is billed at a discount in
+    exchange for asynchronous completion.
+
+    Args:
+        request_ids: List of request IDs to process
+        pool: Pool of active MCP client sessions
+        anthropic_client: Anthropic API client
+        anthropic_tools: MCP tools converted to Anthropic tool format
+        tool_cache: Cache of read-only tool results
+        max_concurrency: Maximum number of requests prerun at once
+
+    Returns:
+        One decision per request ID, in the given order
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def prerun_with_limit(request_id: str):
+        async with semaphore:
+            return await prerun_workflow(request_id, pool, tool_cache)
+
+    # A prerun that raises becomes that request's error decision below
+    preruns = dict(zip(
+        request_ids,
+        await asyncio.gather(
+            *(prerun_with_limit(request_id) for request_id in request_ids),
+            return_exceptions=True
+        )
+    ))
+
+    # Failed validations are answered from the local template, so only
+    # requests that passed need a rationale turn
+    pending = {
+        request_id: prerun[0]
+        for request_id, prerun in preruns.items()
+        if not isinstance(prerun, BaseException) and prerun[2] is None
+    }
+
+    outcomes = {}
+    if pending:
+        batch = await anthropic_client.messages.batches.create(requests=[
+            {
+                "custom_id": request_id,
+                "params": {
+                    "model": MODEL,
+                    "max_tokens": 4096,
+                    "system": SYSTEM_BLOCKS,
+                    "tools": anthropic_tools,
+                    "messages": messages
+                }
+            }
+            for request_id, messages in pending.items()
+        ])
+        print(f"\n📨 Submitted message batch {batch.id} ({len(pending)} request(s))")
+
+        while batch.processing_status != "ended":
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+            batch = await anthropic_client.messages.batches.retrieve(batch.id)
+            print(f"Batch status: {batch.processing_status}")
+            emit_event("batch_status", batch_id=batch.id, status=batch.processing_status)
+
+        # Results arrive in arbitrary order; match them back by custom_id
+        async for entry in await anthropic_client.messages.batches.results(batch.id):
+            outcomes[entry.custom_id] = entry.result
+
+    decisions = []
+    for request_id in request_ids:
+        prerun = preruns[request_id]
+        if isinstance(prerun, BaseException):
+            print(f"\n❌ Error processing {request_id}: {prerun}")
+            decisions.append({
+                "request_id": request_id,
+                "error": str(prerun),
+                "completed_at": _utc_timestamp()
+            })
+            continue
+
+        _, tool_trace, failed_validation = prerun
+        if failed_validation is not None:
+            decisions.append(validation_failure_decision(request_id, tool_trace, failed_validation))
+            continue
+
+        outcome = outcomes.get(request_id)
+        decision = {
+            "request_id": request_id,
+            "validation_passed": True,
+            "trace": tool_trace,
+            "completed_at": _utc_timestamp()
+        }
+        if outcome is not None and outcome.type == "succeeded":
+            decision["rationale"] = "".join(
+                content_block.text for content_block in outcome.message.content
+                if content_block.type == "text"
+            )
+        else:
+            decision["error"] = f"batch_{outcome.type if outcome else 'missing'}"
+        decisions.append(decision)
+
+    return decisions
+
+
+async def run_agent(
+    request_ids: list[str],
+    max_concurrency: int = 4,
+    cache_ttl: float = DEFAULT_CACHE_TTL,
+    cache_file: Path | None = None,
+    batch_size: int = 1,
+    async_batch: bool = False,
+    verbose: bool = False
+):
     """
-    Main agent entry point - processes multiple requests.
+    Main agent entry point - processes multiple requests concurrently.
+
+    Each decision is appended to decisions.jsonl as soon as its request
+    finishes, then the stream is aggregated into decisions.json (in request
+    order) at shutdown.
 
     Args:
         request_ids: List of request IDs to process
+        max_concurrency: Maximum number of requests in flight at once
+        cache_ttl: Lifetime of cached tool results, in seconds
+        cache_file: Optional shelve path for reusing tool results across runs
+        batch_size: Number of requests coalesced into one Claude conversation
+        async_batch: Submit rationale turns through the Message Batches API
+        verbose: Also list the server's resources at startup
     """
     # Check for API key
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
+    if not os.getenv("ANTHROPIC_API_KEY"):
         print("❌ Error: ANTHROPIC_API_KEY not found in environment")
         print("Please create a .env file with your API key:")
         print("  ANTHROPIC_API_KEY=your-key-here")
         sys.exit(1)
 
-    # Initialize Anthropic client
-    anthropic_client = Anthropic(api_key=api_key)
-
-    # Connect to MCP server
-    server_params = StdioServerParameters(
-        command=SERVER_COMMAND,
-        args=SERVER_ARGS,
-        env=None
-    )
-
-    print(f"🚀 Starting MCP server: {SERVER_COMMAND} {' '.join(SERVER_ARGS)}")
-    print(f"📋 Processing {len(request_ids)} request(s)")
-
-    decisions = []
+    print(f"🚀 Starting MCP server: {SERVER_PARAMS.command} {' '.join(SERVER_PARAMS.args)}")
+    print(f"📋 Processing {len(request_ids)} request(s) (max concurrency: {max_concurrency})")
+
+    async with AsyncExitStack() as stack:
+        anthropic_client = _new_anthropic()
+        stack.push_async_callback(anthropic_client.close)
+
+        tool_cache = ToolCache(ttl=cache_ttl, path=cache_file)
+        stack.callback(tool_cache.close)
+
+        # Unbuffered so each decision reaches disk as soon as it is written
+        decisions_stream = stack.enter_context(open(DECISIONS_STREAM_FILE, "wb", buffering=0))
+
+        # One server subprocess per concurrent request slot
+        pool = MCPSessionPool(SERVER_PARAMS, size=max_concurrency)
+        await pool.start(stack)
+
+        print(f"✅ Connected to MCP server ({pool.size} session(s))")
+
+        # One list_tools call, shared by every request. Resources are not
+        # preloaded: the agent has no resource-reading tools and the first
+        # turn is already forced to validate_preset, so inlining them into
+        # each message would only add input tokens.
+        async with pool.acquire() as session:
+            anthropic_tools = await get_anthropic_tools(session)
+
+            # Resources are only listed for debugging
+            if verbose:
+                resources = await session.list_resources()
+                print(f"📚 Available resources: {[resource.uri for resource in resources.resources]}")
+
+        print(f"\n📦 Available tools: {[tool['name'] for tool in anthropic_tools]}")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        def write_decision(result: dict) -> None:
+            # Trace entries are msgspec Structs, encoded natively here
+            decisions_stream.write(msgspec.json.encode(result) + b"\n")
+            emit_event("decision", decision=result)
+
+        async def process_single(request_id: str) -> dict:
+            try:
+                return await process_request(
+                    request_id, pool, anthropic_client, anthropic_tools, tool_cache
+                )
+            except Exception as e:
+                print(f"\n❌ Error processing {request_id}: {e}")
+                return {
+                    "request_id": request_id,
+                    "error": str(e),
+                    "completed_at": _utc_timestamp()
+                }
+
+        async def process_with_limit(batch: list[str]) -> None:
+            async with semaphore:
+                results = None
+                if len(batch) > 1:
+                    tool_trace = []
+                    try:
+                        results = await process_batch(
+                            batch, pool, anthropic_client, anthropic_tools, tool_cache, tool_trace
+                        )
+                    except Exception as e:
+                        print(f"\n⚠️  Batch {batch} failed ({e}) - falling back to single requests")
+
+                        recorded = recorded_batch_decisions(batch, tool_trace, e)
+                        results = [
+                            recorded.get(request_id) or await process_single(request_id)
+                            for request_id in batch
+                        ]
+
+                if results is None:
+                    results = [await process_single(request_id) for request_id in batch]
+
+            for result in results:
+                write_decision(result)
+
+        batches = [
+            request_ids[i:i + batch_size]
+            for i in range(0, len(request_ids), batch_size)
+        ]
+
+        if async_batch:
+            results = await run_agent_batch(
+                request_ids, pool, anthropic_client, anthropic_tools, tool_cache, max_concurrency
+            )
+            for result in results:
+                write_decision(result)
+        else:
+            # Process batches concurrently to overlap LLM and tool latency
+            await asyncio.gather(*(process_with_limit(batch) for batch in batches))
 
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            # Initialize the session
-            await session.initialize()
+    # Aggregate the stream into decisions.json, restoring request order
+    order = {request_id: index for index, request_id in enumerate(request_ids)}
+    decisions = [_loads(line) for line in DECISIONS_STREAM_FILE.read_bytes().splitlines()]
+    decisions.sort(key=lambda decision: order.get(decision["request_id"], len(order)))
+    DECISIONS_FILE.write_bytes(orjson.dumps(decisions, option=orjson.OPT_INDENT_2))
 
-            print("✅ Connected to MCP server")
-
-            # List available tools and resources
-            tools = await session.list_tools()
-            resources = await session.list_resources()
-
-            print(f"\n📦 Available tools: {[tool.name for tool in tools.tools]}")
-            print(f"📚 Available resources: {[resource.uri for resource in resources.resources]}")
-
-            # Process each request
-            for request_id in request_ids:
-                try:
-                    result = await process_request(request_id, session, anthropic_client)
-                    decisions.append(result)
-                except Exception as e:
-                    print(f"\n❌ Error processing {request_id}: {e}")
-                    decisions.append({
-                        "request_id": request_id,
-                        "error": str(e),
-                        "completed_at": datetime.now().isoformat()
-                    })
-
-    # Write decisions to file
-    output_file = Path(__file__).parent / "decisions.json"
-    with open(output_file, "w") as f:
-        json.dump(decisions, f, indent=2)
+    emit_event("done", requests=len(request_ids), output_file=str(DECISIONS_FILE))
 
     print(f"\n{'='*60}")
     print(f"✅ Completed processing {len(request_ids)} request(s)")
-    print(f"📄 Decisions written to: {output_file}")
+    print(f"📄 Decisions streamed to: {DECISIONS_STREAM_FILE}")
+    print(f"📄 Decisions written to: {DECISIONS_FILE}")
     print(f"{'='*60}")
 
 
+def positive_int(value: str) -> int:
+    """argparse type for options that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+
 def main():
     """Command-line interface for the agent."""
     parser = argparse.ArgumentParser(
@@ -313,17 +1150,71 @@ def main():
         default="data/rules.json",
         help="Path to rules JSON file (default: data/rules.json)"
     )
+    parser.add_argument(
+        "--max-concurrency",
+        type=positive_int,
+        default=4,
+        help="Maximum number of requests processed concurrently (default: 4)"
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_CACHE_TTL,
+        help=f"Seconds to reuse read-only tool results (default: {DEFAULT_CACHE_TTL})"
+    )
+    parser.add_argument(
+        "--cache-file",
+        type=Path,
+        default=None,
+        help="Optional file for persisting cached tool results across runs"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=positive_int,
+        default=1,
+        help="Requests coalesced into one Claude conversation (default: 1)"
+    )
+    parser.add_argument(
+        "--async-batch",
+        action="store_true",
+        help="Run tools locally and submit rationale turns via the Message Batches API"
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="List the MCP server's resources at startup"
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=["text", "stream-json"],
+        default="text",
+        help="stream-json writes JSON events to stdout and progress to stderr (default: text)"
+    )
 
     args = parser.parse_args()
 
     # Load requests file to get all request IDs
-    with open(args.requests, "r") as f:
-        requests = json.load(f)
+    requests = _loads(Path(args.requests).read_bytes())
 
     request_ids = [req["id"] for req in requests]
 
+    # In stream-json mode, stdout carries only JSON events
+    global _event_stream
+    stream_json = args.output_format == "stream-json"
+    if stream_json:
+        _event_stream = sys.stdout
+
     # Run the async agent
-    asyncio.run(run_agent(request_ids))
+    with redirect_stdout(sys.stderr) if stream_json else nullcontext():
+        asyncio.run(run_agent(
+            request_ids,
+            max_concurrency=args.max_concurrency,
+            cache_ttl=args.cache_ttl,
+            cache_file=args.cache_file,
+            batch_size=args.batch_size,
+            async_batch=args.async_batch,
+            verbose=args.verbose
+        ))
 
 
 if __name__ == "__main__":
@@ -1,8 +1,17 @@
-import json
+import atexit
+import os
+import queue
+import signal
 import sys
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator, TextIO
+
+import orjson
 from mcp.server.fastmcp import FastMCP
 
 # Initialize MCP server
@@ -10,259 +19,606 @@ mcp = FastMCP("workflow-orchestrator")
 
 # Data directory
 DATA_DIR = Path(__file__).parent / "data"
-DECISIONS_FILE = Path(__file__).parent / "decisions.json"
+# Append-only decision log. Kept apart from the agent's decisions.jsonl,
+# which the agent truncates at the start of every run.
+DECISIONS_FILE = Path(__file__).parent / "recorded_decisions.jsonl"
 LOG_FILE = Path(__file__).parent / "mcp.log"
 
+# Log levels: tool.called / tool.completed rows are DEBUG, validation and
+# decision events are INFO. Set MCP_LOG_LEVEL=10 to log every tool call.
+DEBUG = 10
+INFO = 20
+LOG_LEVEL = int(os.environ.get("MCP_LOG_LEVEL", str(INFO)))
+
+# Background log writer: events are flushed in batches of up to
+# LOG_BATCH_SIZE, or after LOG_FLUSH_INTERVAL_MS, whichever comes first.
+# At most LOG_QUEUE_SIZE events wait in memory; log_event blocks for up to
+# LOG_PUT_TIMEOUT seconds on a full queue before dropping the event.
+LOG_BATCH_SIZE = 256
+LOG_FLUSH_INTERVAL_MS = 50
+LOG_QUEUE_SIZE = 10000
+LOG_PUT_TIMEOUT = 0.01
+
+# Required texture channels, in the (alphabetical) order missing channels
+# are reported in
+_CHAN_NAMES = ("a", "b", "g", "r")
+
+# Request fields read by the tools, stored column-wise (see reload_data)
+REQUEST_FIELDS = ("account", "style", "engine", "topology")
+
 
 def load_json(filename: str) -> Any:
     """Load JSON data from the data directory."""
-    with open(DATA_DIR / filename, "r") as f:
-        return json.load(f)
+    return orjson.loads((DATA_DIR / filename).read_bytes())
+
+
+class AsyncJsonlWriter:
+    """Append JSON records to a file from a background thread.
+
+    Callers serialize and enqueue; the writer thread joins pending lines and
+    appends them with a single write() per batch of up to batch_size records
+    or flush_interval_ms, optionally followed by fsync. With maxsize set the
+    queue is bounded: write() waits up to put_timeout for room, then drops
+    the record and counts it in dropped.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        batch_size: int = 100,
+        flush_interval_ms: int = 50,
+        fsync: bool = False,
+        maxsize: int = 0,
+        put_timeout: float | None = None,
+        echo: TextIO | None = None,
+        name: str = "jsonl-writer"
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.fsync = fsync
+        self.put_timeout = put_timeout
+        self.echo = echo
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict) -> None:
+        """Queue a record to be appended, dropping it if the queue stays full.
+
+        The record is serialized here, so one that cannot be encoded raises
+        orjson.JSONEncodeError to the caller instead of failing its batch.
+        """
+        line = orjson.dumps(record) + b"\n"
+        try:
+            self._queue.put(line, timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Block until every queued record has been written."""
+        self._queue.join()
+
+    def flush_and_join(self) -> None:
+        """Write every queued record, then stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        if self.dropped:
+            print(f"{self.path.name}: dropped {self.dropped} record(s) on a full queue", file=sys.stderr)
+
+    def _run(self):
+        running = True
+        while running:
+            # Block for the first record, then drain whatever else is queued
+            # until the batch is full or the flush interval has passed
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            # None is the shutdown sentinel
+            lines = batch[:-1] if batch[-1] is None else batch
+            running = batch[-1] is not None
+
+            try:
+                if lines:
+                    data = b"".join(lines)
+                    if self.echo is not None:
+                        self.echo.write(data.decode())
+                        self.echo.flush()
+                    with open(self.path, "ab") as f:
+                        f.write(data)
+                        if self.fsync:
+                            f.flush()
+                            os.fsync(f.fileno())
+            except OSError as e:
+                print(f"{self.path.name}: failed to write {len(lines)} record(s): {e}", file=sys.stderr)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+# Log events are echoed to stderr for real-time monitoring. The queue is
+# bounded so a stalled disk cannot grow memory without limit; past
+# LOG_PUT_TIMEOUT of backpressure, events are dropped and counted.
+log_writer = AsyncJsonlWriter(
+    LOG_FILE,
+    batch_size=LOG_BATCH_SIZE,
+    flush_interval_ms=LOG_FLUSH_INTERVAL_MS,
+    maxsize=LOG_QUEUE_SIZE,
+    put_timeout=LOG_PUT_TIMEOUT,
+    echo=sys.stderr,
+    name="mcp-log-writer"
+)
+decision_writer = AsyncJsonlWriter(DECISIONS_FILE, name="decision-writer")
+
+# atexit runs handlers last-registered first, so decisions drain before logs
+atexit.register(log_writer.flush_and_join)
+atexit.register(decision_writer.flush_and_join)
+
+
+def _load_decisions() -> Iterator[dict]:
+    """Yield recorded decisions one line at a time, oldest first."""
+    # Make this process's queued decisions visible first
+    decision_writer.flush()
+    if not DECISIONS_FILE.exists():
+        return
+    with open(DECISIONS_FILE, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+def compact_decisions(output_file: Path) -> int:
+    """Write every recorded decision to output_file as one JSON array.
+
+    A one-shot export for consumers that need an array; record_decision
+    itself only appends. Returns the number of decisions written.
+    """
+    decisions = list(_load_decisions())
+    output_file.write_bytes(orjson.dumps(decisions, option=orjson.OPT_INDENT_2))
+    return len(decisions)
 
 
 def log_event(event: str, **kwargs):
-    """Log structured events to stderr and mcp.log file."""
-    log_entry = {"timestamp": datetime.now().isoformat(), "event": event, **kwargs}
-    log_line = json.dumps(log_entry)
-
-    # Write to stderr for real-time monitoring
-    print(log_line, file=sys.stderr)
-
-    # Append to mcp.log file
-    with open(LOG_FILE, "a") as f:
-        f.write(log_line + "\n")
+    """Log structured events to stderr and mcp.log file (written in the background)."""
+    log_writer.write({"timestamp": datetime.now().isoformat(), "event": event, **kwargs})
+
+
+@dataclass(slots=True)
+class Artist:
+    """Artist row with slotted fields, used by assign_artist's scans."""
+
+    id: str
+    name: str
+    active_load: int
+    capacity: int
+    skills: frozenset[str]  # lowercased
+
+
+def _precompute_preset_validations() -> dict[str, tuple[bool, tuple[str, ...]]]:
+    """Check every preset once for naming config and 4-channel texture packing.
+
+    Returns a map from account ID to (ok, errors).
+    """
+    validations = {}
+    for account_id, preset in presets_data.items():
+        errors = []
+
+        # Check naming pattern exists
+        if "naming" not in preset:
+            errors.append("Missing naming pattern configuration")
+
+        # Check for required 4-channel texture packing
+        packing = preset.get("packing", {})
+        for ch in _CHAN_NAMES:
+            if ch not in packing:
+                errors.append(f"Missing required texture channel: '{ch}'")
+
+        validations[account_id] = (not errors, tuple(errors))
+    return validations
+
+
+def _freeze(value: Any) -> Any:
+    """Return a hashable stand-in for a JSON value.
+
+    Arrays become tuples and objects frozensets of their items, so two values
+    freeze equal exactly when they compare equal (1, 1.0 and True included);
+    every other JSON value is already hashable.
+    """
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return frozenset((key, _freeze(item)) for key, item in value.items())
+    return value
+
+
+def _compile_rule(conditions: dict) -> Callable[[tuple], bool]:
+    """Compile a rule's conditions into a predicate over a request signature.
+
+    The generated lambda compares each condition's signature slot directly,
+    e.g. ``lambda s, v0=..., v1=...: s[2] == v0 and s[4] == v1``. Values are
+    frozen like the signature's and bound as defaults rather than spliced
+    into the source.
+    """
+    if not conditions:
+        return lambda signature: True
+
+    bindings = {}
+    params = []
+    clauses = []
+    for n, (key, value) in enumerate(conditions.items()):
+        bindings[f"v{n}"] = _freeze(value)
+        params.append(f"v{n}=v{n}")
+        clauses.append(f"s[{SIG_KEYS.index(key)}] == v{n}")
+
+    source = f"lambda s, {', '.join(params)}: {' and '.join(clauses)}"
+    return eval(compile(source, "<rule>", "eval"), {}, bindings)
+
+
+def reload_data():
+    """Load the data files and rebuild everything derived from them.
+
+    Runs once at import; call it again after the files in data/ change.
+    """
+    global requests_data, artists_data, presets_data, rules_data
+    global artists_by_id, ARTISTS, ARTISTS_BY_LOAD, SKILL_BY_LOAD
+    global RULE_KEYS, SIG_KEYS, PAIR_BIT, RULE_MASKS, PRESET_VALIDATION
+    global REQUEST_INDEX, REQUEST_COLUMNS, REQUEST_SIGNATURES, RULE_PREDICATES, ACCOUNT_BY_REQUEST_ID
+    global REQUEST_ACCOUNT, REQUEST_STYLE, REQUEST_ENGINE, REQUEST_TOPOLOGY
+    global _REQUESTS_JSON, _ARTISTS_JSON, _PRESETS_JSON, _RULES_JSON, _DATA_VERSION
+
+    requests_data = load_json("request.json")
+    artists_data = load_json("artists.json")
+    presets_data = load_json("presets.json")
+    rules_data = load_json("rules.json")
+
+    # Create lookup dictionary for fast access
+    artists_by_id = {artist["id"]: artist for artist in artists_data}
+
+    # Validation verdict per preset account
+    PRESET_VALIDATION = _precompute_preset_validations()
+
+    # Slotted artist records, parallel to artists_data (which stays as
+    # loaded for resource://artists)
+    ARTISTS = [
+        Artist(
+            id=artist["id"],
+            name=artist["name"],
+            active_load=artist["active_load"],
+            capacity=artist["capacity_concurrent"],
+            skills=frozenset(skill.lower() for skill in artist["skills"])
+        )
+        for artist in artists_data
+    ]
+
+    # (active_load, index) pairs sorted ascending: for all artists, and per
+    # lowercased skill for the artists that have it. Loads do not change
+    # while the server runs, so a sorted list serves as a ready-made heap.
+    ARTISTS_BY_LOAD = sorted((artist.active_load, idx) for idx, artist in enumerate(ARTISTS))
+    SKILL_BY_LOAD = {}
+    for load, artist_idx in ARTISTS_BY_LOAD:
+        for skill in ARTISTS[artist_idx].skills:
+            SKILL_BY_LOAD.setdefault(skill, []).append((load, artist_idx))
+
+    # Rule prefilter: each distinct (condition key, frozen value) pair gets
+    # one bit, and a rule's mask holds the bits of the pairs it requires (0
+    # for a rule without conditions)
+    PAIR_BIT = {}
+    RULE_MASKS = []
+    for rule in rules_data:
+        mask = 0
+        for key, value in rule["if"].items():
+            mask |= PAIR_BIT.setdefault((key, _freeze(value)), 1 << len(PAIR_BIT))
+        RULE_MASKS.append(mask)
+    RULE_KEYS = frozenset(key for key, _ in PAIR_BIT)
+
+    # A request's signature is its frozen values for the rule keys, in
+    # SIG_KEYS order; requests with equal signatures match the same rules
+    SIG_KEYS = tuple(sorted(RULE_KEYS))
+
+    # Requests as struct-of-arrays: REQUEST_INDEX maps a request ID to its
+    # row, and each column holds one field for every row (None if absent).
+    # Columns cover the tool fields and every key a rule tests.
+    REQUEST_INDEX = {req["id"]: idx for idx, req in enumerate(requests_data)}
+    REQUEST_COLUMNS = {
+        field: [req.get(field) for req in requests_data]
+        for field in sorted(RULE_KEYS.union(REQUEST_FIELDS))
+    }
+    REQUEST_ACCOUNT = REQUEST_COLUMNS["account"]
+    REQUEST_STYLE = REQUEST_COLUMNS["style"]
+    REQUEST_ENGINE = REQUEST_COLUMNS["engine"]
+    REQUEST_TOPOLOGY = REQUEST_COLUMNS["topology"]
+
+    # Account per request ID, denormalized for validate_preset
+    ACCOUNT_BY_REQUEST_ID = {
+        request_id: REQUEST_ACCOUNT[idx] for request_id, idx in REQUEST_INDEX.items()
+    }
 
+    # Rule signature per request row
+    REQUEST_SIGNATURES = [
+        tuple(_freeze(REQUEST_COLUMNS[key][idx]) for key in SIG_KEYS)
+        for idx in range(len(requests_data))
+    ]
+
+    # One compiled predicate per rule, evaluated against a signature
+    RULE_PREDICATES = [_compile_rule(rule["if"]) for rule in rules_data]
+
+    # Resource payloads, serialized once instead of on every read
+    _REQUESTS_JSON = orjson.dumps(requests_data, option=orjson.OPT_INDENT_2).decode()
+    _ARTISTS_JSON = orjson.dumps(artists_data, option=orjson.OPT_INDENT_2).decode()
+    _PRESETS_JSON = orjson.dumps(presets_data, option=orjson.OPT_INDENT_2).decode()
+    _RULES_JSON = orjson.dumps(rules_data, option=orjson.OPT_INDENT_2).decode()
+
+    # Invalidate memoized tool results computed from the previous data
+    _DATA_VERSION += 1
+
+
+# Bumped by every reload_data(); part of each memoized tool's cache key
+_DATA_VERSION = 0
+
+# Data and derived lookups, (re)built by reload_data()
+requests_data: list[dict]
+artists_data: list[dict]
+presets_data: dict[str, dict]
+rules_data: list[dict]
+artists_by_id: dict[str, dict]
+PRESET_VALIDATION: dict[str, tuple[bool, tuple[str, ...]]]
+ARTISTS: list[Artist]
+ARTISTS_BY_LOAD: list[tuple[int, int]]
+SKILL_BY_LOAD: dict[str, list[tuple[int, int]]]
+PAIR_BIT: dict[tuple[str, Any], int]
+RULE_MASKS: list[int]
+RULE_KEYS: frozenset[str]
+REQUEST_INDEX: dict[str, int]
+REQUEST_COLUMNS: dict[str, list]
+REQUEST_ACCOUNT: list
+REQUEST_STYLE: list
+REQUEST_ENGINE: list
+REQUEST_TOPOLOGY: list
+ACCOUNT_BY_REQUEST_ID: dict[str, str | None]
+SIG_KEYS: tuple[str, ...]
+REQUEST_SIGNATURES: list[tuple]
+RULE_PREDICATES: list[Callable[[tuple], bool]]
 
 # Load data at startup (cache in memory)
-requests_data = load_json("request.json")
-artists_data = load_json("artists.json")
-presets_data = load_json("presets.json")
-rules_data = load_json("rules.json")
+reload_data()
 
-# Create lookup dictionaries for fast access
-requests_by_id = {req["id"]: req for req in requests_data}
-artists_by_id = {artist["id"]: artist for artist in artists_data}
 
+@lru_cache(maxsize=8192)
+def _matched_indices_for_sig(signature: tuple, version: int) -> tuple[int, ...]:
+    """Return the indices, in rule order, of rules matching a request signature.
 
-@mcp.tool()
-def validate_preset(request_id: str) -> dict:
-    """Validates preset has naming config and 4-channel texture packing (r,g,b,a).
-    Account ID is auto-derived from request."""
-    start_time = datetime.now()
+    Memoized per data version, so the rules are evaluated once per distinct
+    signature rather than once per request.
+    """
+    # A rule can only match if the signature has every pair bit it requires,
+    # so one AND rejects most rules before their predicate runs
+    signature_mask = 0
+    for key, value in zip(SIG_KEYS, signature):
+        signature_mask |= PAIR_BIT.get((key, value), 0)
+    return tuple(
+        idx for idx, mask in enumerate(RULE_MASKS)
+        if mask & signature_mask == mask and RULE_PREDICATES[idx](signature)
+    )
 
-    # Look up account_id from request
-    if request_id not in requests_by_id:
-        result = {
-            "ok": False,
-            "errors": [f"Request '{request_id}' not found"]
-        }
-        log_event("validation.failed", request_id=request_id, reason="request_not_found")
-        return result
 
-    account_id = requests_by_id[request_id].get("account")
-    if not account_id:
-        result = {
-            "ok": False,
-            "errors": [f"Request '{request_id}' has no account field"]
-        }
-        log_event("validation.failed", request_id=request_id, reason="no_account_in_request")
-        return result
+def match_rules(request_idx: int) -> tuple[int, ...]:
+    """Return the indices, in rule order, of rules whose conditions all match a request row."""
+    return _matched_indices_for_sig(REQUEST_SIGNATURES[request_idx], _DATA_VERSION)
 
-    log_event("tool.called", tool="validate_preset", request_id=request_id, account_id=account_id)
 
-    # Check if preset exists
-    if account_id not in presets_data:
-        result = {
-            "ok": False,
-            "errors": [f"No preset found for account '{account_id}'"]
-        }
-        log_event("validation.failed", request_id=request_id, reason="preset_not_found")
-        return result
+@lru_cache(maxsize=4096)
+def _validate_preset_cached(request_id: str, version: int) -> tuple[bool, tuple[str, ...], str | None, str | None]:
+    """Return (ok, errors, failure reason, account ID) for a request.
 
-    preset = presets_data[account_id]
-    errors = []
+    The reason is set only when there is no verdict to report (unknown
+    request, no account, no preset); account ID is None when it could not
+    be resolved. Memoized per data version.
+    """
+    account_id = ACCOUNT_BY_REQUEST_ID.get(request_id)
+    if not account_id:
+        # Unknown requests and requests without an account both miss, and
+        # are told apart only on this cold path
+        if request_id not in REQUEST_INDEX:
+            return False, (f"Request '{request_id}' not found",), "request_not_found", None
+        return False, (f"Request '{request_id}' has no account field",), "no_account_in_request", None
 
-    # Check naming pattern exists
-    if "naming" not in preset:
-        errors.append("Missing naming pattern configuration")
+    # Presets are static, so the verdict was computed at load
+    verdict = PRESET_VALIDATION.get(account_id)
+    if verdict is None:
+        return False, (f"No preset found for account '{account_id}'",), "preset_not_found", account_id
+    return verdict[0], verdict[1], None, account_id
 
-    # Check for required 4-channel texture packing
-    packing = preset.get("packing", {})
-    required_channels = {"r", "g", "b", "a"}
-    actual_channels = set(packing.keys())
-    missing_channels = required_channels - actual_channels
 
-    if missing_channels:
-        errors.extend([f"Missing required texture channel: '{ch}'" for ch in sorted(missing_channels)])
+@lru_cache(maxsize=4096)
+def _plan_steps_cached(request_id: str, version: int) -> tuple[tuple[str, ...], tuple[int, ...]] | None:
+    """Return (steps, matched rule indices) for a request, or None if it is unknown.
 
-    if errors:
-        result = {
-            "ok": False,
-            "errors": errors
-        }
-        log_event("validation.failed", request_id=request_id, errors=errors)
-    else:
-        result = {
-            "ok": True,
-            "errors": []
-        }
-        log_event("validation.passed", request_id=request_id)
+    Memoized per data version.
+    """
+    request_idx = REQUEST_INDEX.get(request_id)
+    if request_idx is None:
+        return None
 
-    duration_ms = (datetime.now() - start_time).total_seconds() * 1000
-    log_event("tool.completed", tool="validate_preset", request_id=request_id, ok=result["ok"], duration_ms=duration_ms)
-    return result
+    steps = []
+    rule_indices = match_rules(request_idx)
+    for rule_idx in rule_indices:
+        # Extract steps from rule actions
+        steps.extend(rules_data[rule_idx]["then"].get("steps", ()))
+    return tuple(steps), rule_indices
 
 
 @mcp.tool()
-def plan_steps(request_id: str) -> dict:
-    """Plans workflow steps by matching request attributes against rules."""
-    start_time = datetime.now()
-    log_event("tool.called", tool="plan_steps", request_id=request_id)
-
-    if request_id not in requests_by_id:
-        log_event("tool.completed", tool="plan_steps", request_id=request_id, error="request_not_found")
-        return {"steps": [], "matched_rules": []}
-
-    request = requests_by_id[request_id]
-    steps = []
-    matched_rules = []
-
-    # Check each rule
-    for rule_idx, rule in enumerate(rules_data):
-        conditions = rule["if"]
+def validate_preset(request_id: str) -> dict:
+    """Validates preset has naming config and 4-channel texture packing (r,g,b,a).
+    Account ID is auto-derived from request."""
+    start_ns = time.perf_counter_ns()
 
-        # Check if all conditions match
-        matches = all(
-            request.get(key) == value
-            for key, value in conditions.items()
-        )
+    ok, errors, reason, account_id = _validate_preset_cached(request_id, _DATA_VERSION)
 
-        if matches:
-            actions = rule["then"]
+    # Unknown request, or no account on the request
+    if account_id is None:
+        log_event("validation.failed", request_id=request_id, reason=reason)
+        return {"ok": False, "errors": list(errors), "reason": reason}
 
-            # Extract steps from rule actions
-            if "steps" in actions:
-                steps.extend(actions["steps"])
+    if LOG_LEVEL <= DEBUG:
+        log_event("tool.called", tool="validate_preset", request_id=request_id, account_id=account_id)
 
-            # Record matched rule
-            matched_rules.append({
-                "rule_index": rule_idx,
-                "conditions": conditions,
-                "actions": actions
-            })
+    # No preset for the account
+    if reason is not None:
+        log_event("validation.failed", request_id=request_id, reason=reason)
+        return {"ok": False, "errors": list(errors), "reason": reason}
 
     result = {
-        "steps": steps,
-        "matched_rules": matched_rules
+        "ok": ok,
+        "errors": list(errors)
     }
+    if not ok:
+        log_event("validation.failed", request_id=request_id, errors=result["errors"])
+    else:
+        log_event("validation.passed", request_id=request_id)
 
-    duration_ms = (datetime.now() - start_time).total_seconds() * 1000
-    log_event("tool.completed", tool="plan_steps", request_id=request_id, steps_count=len(steps), duration_ms=duration_ms)
+    if LOG_LEVEL <= DEBUG:
+        duration_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
+        log_event("tool.completed", tool="validate_preset", request_id=request_id, ok=result["ok"], duration_ms=duration_ms)
+    return result
+
+
+@mcp.tool()
+def plan_steps(request_id: str, include_matched_rules: bool = True) -> dict:
+    """Plans workflow steps by matching request attributes against rules.
+    Set include_matched_rules=False to return only the steps."""
+    start_ns = time.perf_counter_ns()
+    if LOG_LEVEL <= DEBUG:
+        log_event("tool.called", tool="plan_steps", request_id=request_id)
+
+    plan = _plan_steps_cached(request_id, _DATA_VERSION)
+    if plan is None:
+        if LOG_LEVEL <= DEBUG:
+            log_event("tool.completed", tool="plan_steps", request_id=request_id, error="request_not_found")
+        return {"steps": [], "matched_rules": []} if include_matched_rules else {"steps": []}
+
+    steps, rule_indices = plan
+    result = {"steps": list(steps)}
+
+    # Record matched rules. conditions and actions are the loaded rule dicts
+    # themselves, not copies; nothing mutates them after load.
+    if include_matched_rules:
+        result["matched_rules"] = [
+            {
+                "rule_index": rule_idx,
+                "conditions": rules_data[rule_idx]["if"],
+                "actions": rules_data[rule_idx]["then"]
+            }
+            for rule_idx in rule_indices
+        ]
+
+    if LOG_LEVEL <= DEBUG:
+        duration_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
+        log_event("tool.completed", tool="plan_steps", request_id=request_id, steps_count=len(steps), duration_ms=duration_ms)
     return result
 
 
 @mcp.tool()
 def assign_artist(request_id: str) -> dict:
     """Assigns artist based on required skills and capacity. Selects artist with lowest load."""
-    start_time = datetime.now()
-    log_event("tool.called", tool="assign_artist", request_id=request_id)
+    start_ns = time.perf_counter_ns()
+    if LOG_LEVEL <= DEBUG:
+        log_event("tool.called", tool="assign_artist", request_id=request_id)
 
-    if request_id not in requests_by_id:
+    request_idx = REQUEST_INDEX.get(request_id)
+    if request_idx is None:
         result = {
             "artist_id": None,
             "artist_name": None,
             "reason": f"Request '{request_id}' not found"
         }
-        log_event("tool.completed", tool="assign_artist", request_id=request_id, assigned=False)
+        if LOG_LEVEL <= DEBUG:
+            log_event("tool.completed", tool="assign_artist", request_id=request_id, assigned=False)
         return result
 
-    request = requests_by_id[request_id]
     required_skills = []
 
     # Determine required skills from request attributes
-    if "style" in request:
-        required_skills.append(request["style"])
-    if "engine" in request:
-        required_skills.append(request["engine"].lower())
-    if "topology" in request:
-        required_skills.append(request["topology"])
-
-    # Find artists with matching skills and available capacity
-    eligible_artists = []
-
-    for artist in artists_data:
-        # Check capacity
-        has_capacity = artist["active_load"] < artist["capacity_concurrent"]
-        if not has_capacity:
-            continue
-
-        # Check skill match
-        artist_skills = set(skill.lower() for skill in artist["skills"])
-        required_skills_lower = set(skill.lower() for skill in required_skills)
-        skills_match = required_skills_lower.issubset(artist_skills)
-
-        if skills_match:
-            eligible_artists.append({
-                "id": artist["id"],
-                "name": artist["name"],
-                "load": artist["active_load"],
-                "capacity": artist["capacity_concurrent"]
-            })
+    style = REQUEST_STYLE[request_idx]
+    engine = REQUEST_ENGINE[request_idx]
+    topology = REQUEST_TOPOLOGY[request_idx]
+    if style is not None:
+        required_skills.append(style)
+    if engine is not None:
+        required_skills.append(engine.lower())
+    if topology is not None:
+        required_skills.append(topology)
+    # Built once per call; the artist loop only runs the subset check
+    required_skills_lower = frozenset(skill.lower() for skill in required_skills)
+
+    # Walk the smallest required-skill bucket in (load, index) order. The
+    # first artist with capacity and every other required skill has the
+    # lowest load, with ties going to the earlier artist in artists_data.
+    buckets = [SKILL_BY_LOAD.get(skill, []) for skill in required_skills_lower] or [ARTISTS_BY_LOAD]
+
+    best_artist = None
+    for _, artist_idx in min(buckets, key=len):
+        artist = ARTISTS[artist_idx]
+        if artist.active_load < artist.capacity and required_skills_lower <= artist.skills:
+            best_artist = artist
+            break
 
     # No eligible artists
-    if not eligible_artists:
+    if best_artist is None:
         result = {
             "artist_id": None,
             "artist_name": None,
             "reason": f"No artists available with required skills: {required_skills}"
         }
-        log_event("tool.completed", tool="assign_artist", request_id=request_id, assigned=False)
+        if LOG_LEVEL <= DEBUG:
+            log_event("tool.completed", tool="assign_artist", request_id=request_id, assigned=False)
         return result
 
-    # Select artist with lowest load
-    best_artist = min(eligible_artists, key=lambda a: a["load"])
-
     result = {
-        "artist_id": best_artist["id"],
-        "artist_name": best_artist["name"],
-        "reason": f"{best_artist['name']} has required skills {required_skills} and capacity ({best_artist['load']}/{best_artist['capacity']})"
+        "artist_id": best_artist.id,
+        "artist_name": best_artist.name,
+        "reason": f"{best_artist.name} has required skills {required_skills} and capacity ({best_artist.active_load}/{best_artist.capacity})"
     }
 
-    duration_ms = (datetime.now() - start_time).total_seconds() * 1000
-    log_event("tool.completed", tool="assign_artist", request_id=request_id, assigned=True, artist_id=best_artist["id"], duration_ms=duration_ms)
+    if LOG_LEVEL <= DEBUG:
+        duration_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
+        log_event("tool.completed", tool="assign_artist", request_id=request_id, assigned=True, artist_id=best_artist.id, duration_ms=duration_ms)
     return result
 
 
 @mcp.tool()
 def record_decision(request_id: str, decision_data: dict) -> dict:
-    """Records decision to decisions.json with audit trail."""
-    start_time = datetime.now()
-    log_event("tool.called", tool="record_decision", request_id=request_id)
+    """Records decision to recorded_decisions.jsonl with audit trail."""
+    start_ns = time.perf_counter_ns()
+    if LOG_LEVEL <= DEBUG:
+        log_event("tool.called", tool="record_decision", request_id=request_id)
 
-    # Create decision record
+    # Create decision record; the ID and recorded_at share one clock read
+    now = datetime.now()
     decision = {
-        "decision_id": f"dec-{request_id}-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        "decision_id": f"dec-{request_id}-{now.strftime('%Y%m%d%H%M%S')}",
         "request_id": request_id,
-        "recorded_at": datetime.now().isoformat(),
+        "recorded_at": now.isoformat(),
         **decision_data
     }
 
-    # Load existing decisions or create new file
-    try:
-        if DECISIONS_FILE.exists():
-            with open(DECISIONS_FILE, "r") as f:
-                decisions = json.load(f)
-        else:
-            decisions = []
-    except (json.JSONDecodeError, FileNotFoundError):
-        decisions = []
-
-    # Append new decision
-    decisions.append(decision)
-
-    # Write back to file
-    with open(DECISIONS_FILE, "w") as f:
-        json.dump(decisions, f, indent=2)
+    # Queue one JSON line for the background writer; earlier decisions are
+    # never re-read or rewritten
+    decision_writer.write(decision)
 
     result = {
         "decision_id": decision["decision_id"],
@@ -270,9 +626,10 @@ def record_decision(request_id: str, decision_data: dict) -> dict:
         "success": True
     }
 
-    duration_ms = (datetime.now() - start_time).total_seconds() * 1000
     log_event("decision.recorded", decision_id=decision["decision_id"], request_id=request_id)
-    log_event("tool.completed", tool="record_decision", request_id=request_id, decision_id=decision["decision_id"], duration_ms=duration_ms)
+    if LOG_LEVEL <= DEBUG:
+        duration_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
+        log_event("tool.completed", tool="record_decision", request_id=request_id, decision_id=decision["decision_id"], duration_ms=duration_ms)
 
     return result
 
@@ -280,27 +637,31 @@ def record_decision(request_id: str, decision_data: dict) -> dict:
 @mcp.resource("resource://requests")
 def get_requests() -> str:
     """Returns all workflow requests."""
-    return json.dumps(requests_data, indent=2)
+    return _REQUESTS_JSON
 
 
 @mcp.resource("resource://artists")
 def get_artists() -> str:
     """Returns all artists with their skills and capacity."""
-    return json.dumps(artists_data, indent=2)
+    return _ARTISTS_JSON
 
 
 @mcp.resource("resource://presets")
 def get_presets() -> str:
     """Returns all account presets with texture packing configurations."""
-    return json.dumps(presets_data, indent=2)
+    return _PRESETS_JSON
 
 
 @mcp.resource("resource://rules")
 def get_rules() -> str:
     """Returns all workflow rules for conditional step planning."""
-    return json.dumps(rules_data, indent=2)
+    return _RULES_JSON
 
 
 if __name__ == "__main__":
+    # Exit normally on SIGTERM so the atexit hooks flush queued log events
+    # and decisions
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     log_event("server.starting", tools=4, resources=4)
     mcp.run()
@@ -0,0 +1,64 @@
+import argparse
+
+import msgspec
+import pytest
+from run_agent import TraceEntry, ToolCache, batch_decision, positive_int, recorded_batch_decisions
+
+
+def trace_entry(tool, request_id, output=None):
+    """Build a trace entry for a tool call on request_id"""
+    return TraceEntry(
+        tool=tool,
+        input=msgspec.Raw(msgspec.json.encode({"request_id": request_id})),
+        timestamp="2025-01-01T00:00:00+00:00",
+        output=output
+    )
+
+
+def test_tool_cache_get_before_and_after_expiry():
+    """Test that cached tool output is returned until its TTL passes"""
+    cache = ToolCache(ttl=60)
+    cache.set("live", "fresh")
+    cache.set("stale", "old", ttl=-1)
+
+    assert cache.get("live") == "fresh"
+    assert cache.get("stale") is None
+    assert cache.get("missing") is None
+
+
+def test_batch_decision_filters_trace_and_derives_verdict():
+    """Test that a batch decision keeps only its own request's calls and reads the verdict from validate_preset"""
+    tool_trace = [
+        trace_entry("validate_preset", "req-001", {"ok": True, "errors": []}),
+        trace_entry("validate_preset", "req-002", {"ok": False, "errors": ["x"]}),
+        trace_entry("plan_steps", "req-001", {"steps": []}),
+    ]
+
+    passed = batch_decision("req-001", tool_trace, "ok", "t")
+    failed = batch_decision("req-002", tool_trace, "no", "t")
+
+    assert [entry.tool for entry in passed["trace"]] == ["validate_preset", "plan_steps"]
+    assert passed["validation_passed"] is True
+    assert failed["validation_passed"] is False
+
+
+def test_recorded_batch_decisions_skips_unrecorded_requests():
+    """Test that a failed batch only salvages requests whose decision was already recorded"""
+    tool_trace = [
+        trace_entry("validate_preset", "req-001", {"ok": True, "errors": []}),
+        trace_entry("record_decision", "req-001", {"success": True}),
+        trace_entry("validate_preset", "req-002", {"ok": True, "errors": []}),
+    ]
+
+    recorded = recorded_batch_decisions(["req-001", "req-002", "req-003"], tool_trace, ValueError("bad reply"))
+
+    assert list(recorded) == ["req-001"]
+    assert "bad reply" in recorded["req-001"]["error"]
+
+
+def test_positive_int_rejects_non_positive_values():
+    """Test that --max-concurrency and --batch-size only accept values of at least 1"""
+    assert positive_int("3") == 3
+    for value in ("0", "-2"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            positive_int(value)
@@ -1,5 +1,20 @@
 import pytest
-from server import validate_preset, plan_steps, assign_artist, record_decision
+import server
+from server import validate_preset, plan_steps, assign_artist, record_decision, _load_decisions
+
+
+@pytest.fixture
+def reload_with(monkeypatch):
+    """Reload server data with some data files replaced, restoring the originals afterwards"""
+    load_json = server.load_json
+
+    def _reload(overrides):
+        monkeypatch.setattr(server, "load_json", lambda filename: overrides.get(filename) or load_json(filename))
+        server.reload_data()
+
+    yield _reload
+    monkeypatch.undo()
+    server.reload_data()
 
 
 def test_validate_preset_success():
@@ -25,6 +40,7 @@ def test_validate_preset_not_found():
 
     assert result["ok"] is False
     assert any("not found" in error for error in result["errors"])
+    assert result["reason"] == "request_not_found"
 
 
 def test_plan_steps_matches_rules():
@@ -46,6 +62,72 @@ def test_plan_steps_priority_rule():
     assert any(rule["actions"].get("queue") == "expedite" for rule in matched_rules)
 
 
+def test_plan_steps_without_matched_rules():
+    """Test that matched rule details can be skipped when only steps are needed"""
+    result = plan_steps("req-001", include_matched_rules=False)
+
+    assert result["steps"] == ["style_tweak_review", "export_unreal_glb"]
+    assert "matched_rules" not in result
+
+
+def test_plan_steps_with_array_condition(reload_with):
+    """Test that a rule conditioned on a JSON array loads and leaves other rules intact"""
+    rules = server.load_json("rules.json") + [
+        {"if": {"tags": ["x", "y"]}, "then": {"steps": ["tagged_review"]}}
+    ]
+    reload_with({"rules.json": rules})
+
+    result = plan_steps("req-001", include_matched_rules=False)
+
+    assert result["steps"] == ["style_tweak_review", "export_unreal_glb"]
+
+
+def test_plan_steps_request_with_array_value(reload_with):
+    """Test that a request whose rule-tested field is a JSON array still matches"""
+    requests = server.load_json("request.json") + [
+        {"id": "req-tags", "account": "BlueNova", "engine": "Unity", "tags": ["x", "y"]}
+    ]
+    rules = server.load_json("rules.json") + [
+        {"if": {"tags": ["x", "y"]}, "then": {"steps": ["tagged_review"]}}
+    ]
+    reload_with({"request.json": requests, "rules.json": rules})
+
+    result = plan_steps("req-tags", include_matched_rules=False)
+
+    assert result["steps"] == ["tagged_review"]
+
+
+def test_plan_steps_array_values_compare_by_equality(reload_with):
+    """Test that array values match rules the same way == does, so [1] matches [1.0]"""
+    requests = server.load_json("request.json") + [
+        {"id": "req-tags", "account": "BlueNova", "tags": [1, {"a": True}]}
+    ]
+    rules = server.load_json("rules.json") + [
+        {"if": {"tags": [1.0, {"a": 1}]}, "then": {"steps": ["tagged_review"]}}
+    ]
+    reload_with({"request.json": requests, "rules.json": rules})
+
+    result = plan_steps("req-tags", include_matched_rules=False)
+
+    assert result["steps"] == ["tagged_review"]
+
+
+def test_reload_data_invalidates_cached_results(reload_with):
+    """Test that memoized validate_preset and plan_steps results do not survive a data reload"""
+    assert validate_preset("req-002")["ok"] is False
+    assert plan_steps("req-003")["steps"] == []
+
+    presets = server.load_json("presets.json")
+    presets["TitanMfg"] = presets["ArcadiaXR"]
+    rules = server.load_json("rules.json") + [
+        {"if": {"engine": "Unity"}, "then": {"steps": ["export_unity_package"]}}
+    ]
+    reload_with({"presets.json": presets, "rules.json": rules})
+
+    assert validate_preset("req-002")["ok"] is True
+    assert plan_steps("req-003")["steps"] == ["export_unity_package"]
+
+
 def test_assign_artist_with_capacity():
     """Test that artist is assigned when they have capacity and matching skills"""
     result = assign_artist("req-002")  # Needs pbr, unreal, quad_only
@@ -95,4 +177,25 @@ def test_record_decision_idempotency():
 
     # Both should succeed
     assert result1["success"] is True
-    assert result2["success"] is True
\ No newline at end of file
+    assert result2["success"] is True
+
+
+def test_record_decision_is_persisted():
+    """Test that a queued decision is appended to the decisions log"""
+    result = record_decision("req-test-003", {"test": "persisted"})
+
+    recorded = [d for d in _load_decisions() if d["decision_id"] == result["decision_id"]]
+    assert len(recorded) >= 1
+    assert recorded[-1]["test"] == "persisted"
+
+
+def test_record_decision_rejects_unencodable_data():
+    """Test that an unencodable decision raises without losing the decisions around it"""
+    before = record_decision("req-test-004", {"test": "before"})
+    with pytest.raises(TypeError):
+        record_decision("req-test-004", {"count": 2 ** 70})
+    after = record_decision("req-test-004", {"test": "after"})
+
+    recorded = {d["decision_id"] for d in _load_decisions()}
+    assert before["decision_id"] in recorded
+    assert after["decision_id"] in recorded